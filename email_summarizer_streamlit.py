@@ -4,10 +4,16 @@ Run with: streamlit run email_summarizer_streamlit.py
 """
 
 import streamlit as st
-from transformers import pipeline
-import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import queue
 import time
 
+from email_core import (DEFAULT_SUMMARY_LENGTH, SUMMARY_LENGTHS, PendingQueue, SummaryCache,
+                        content_key, extract_subject, load_sample_email,
+                        preprocess_email, summary_stats, worker_device, worker_summarize)
+
 # Page configuration
 st.set_page_config(
     page_title="Email Summarizer",
@@ -64,108 +70,105 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+class ModelWorker:
+    """The model worker process, with the batching queue and manager feeding it"""
+    
+    def __init__(self):
+        # The model lives in its own process, so loading and inference never
+        # stall the app and a crashed worker doesn't take the app down
+        context = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        try:
+            # The first task loads the model, so a load error comes back as
+            # itself rather than as a BrokenProcessPool from an initializer
+            self.device = self.executor.submit(worker_device).result()
+        except Exception:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        # Streamed summary pieces come back from the worker process through a manager queue
+        self.manager = context.Manager()
+        self.pending_queue = PendingQueue(self._run_batch)
+        
+    def _run_batch(self, texts, max_length, min_length, on_text=None):
+        if on_text is None:
+            return self.executor.submit(worker_summarize, texts, max_length, min_length).result()
+        pieces = self.manager.Queue()
+        future = self.executor.submit(worker_summarize, texts, max_length, min_length, pieces.put)
+        while not future.done() or not pieces.empty():
+            try:
+                on_text(pieces.get(timeout=0.05))
+            except queue.Empty:
+                pass
+        return future.result()
+    
+    def close(self):
+        """Stop the batching thread, worker process and manager; False if already closed"""
+        if not self.pending_queue.close():
+            return False
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+        return True
+
 @st.cache_resource
 def load_summarization_model():
-    """Load and cache the summarization model"""
+    """Start the model worker and wait for the model to load
+    
+    Raises the worker's load error; failures aren't cached, so the next run retries.
+    """
     with st.spinner("Loading AI model... This may take a minute on first run."):
-        try:
-            summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-            return summarizer, True
-        except Exception as e:
-            st.error(f"Failed to load model: {str(e)}")
-            return None, False
+        return ModelWorker()
 
-def extract_subject(email_text):
-    """Extract subject from email (first line or first 60 chars)"""
-    lines = email_text.strip().split('\n')
-    first_line = lines[0] if lines else email_text[:60]
-    
-    # Clean up the subject
-    subject = first_line.strip()
-    
-    # Remove "Subject:" prefix if present
-    subject = re.sub(r'^Subject:\s*', '', subject, flags=re.IGNORECASE)
-    
-    if len(subject) > 60:
-        subject = subject[:57] + "..."
-        
-    return subject
+def reset_model_worker(worker):
+    """Shut down a dead model worker, so the next run starts a fresh one"""
+    # Several sessions can see the same crash; only the first one resets
+    if worker.close():
+        load_summarization_model.clear()
 
-def preprocess_email(email_text):
-    """Preprocess email text for better summarization"""
-    # Remove excessive whitespace
-    text = re.sub(r'\n\s*\n', '\n\n', email_text)
-    
-    # Remove email headers if present
-    text = re.sub(r'^(From|To|Date|Subject|Cc|Bcc):.*$', '', text, flags=re.MULTILINE)
-    
-    # Remove quoted text (lines starting with >)
-    text = re.sub(r'^>.*$', '', text, flags=re.MULTILINE)
-    
-    # Remove email signatures (common patterns)
-    text = re.sub(r'(Best regards|Sincerely|Thanks|Regards|Best|Cheers),?\s*\n.*', '', 
-                 text, flags=re.IGNORECASE | re.DOTALL)
-    
-    # Remove multiple consecutive newlines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+@st.cache_resource
+def load_summary_cache():
+    """Create the summary cache shared by every session of this app"""
+    return SummaryCache()
 
-def summarize_email(email_text, summarizer):
-    """Generate summary for the email"""
+def summarize_email(email_text, worker, summary_cache, placeholder,
+                    length=DEFAULT_SUMMARY_LENGTH):
+    """Generate summary for the email, streaming it into placeholder as it's generated"""
     # Extract subject
     subject = extract_subject(email_text)
     
     # Preprocess email
     processed_text = preprocess_email(email_text)
     
-    # Truncate if too long (BART has max input length)
-    max_length = 1024
-    if len(processed_text) > max_length:
-        processed_text = processed_text[:max_length]
-        st.warning("⚠️ Email was truncated due to length limitations.")
+    # Reuse the summary if this text was summarized before
+    key = (content_key(processed_text), length)
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return subject, summary, True
     
-    # Generate summary
+    # Generate summary; pieces are handed over from the batching thread because
+    # only this script thread may update the page
+    pieces = queue.Queue()
+    future = worker.pending_queue.submit(processed_text, *SUMMARY_LENGTHS[length], on_text=pieces.put)
+    partial_summary = ""
     with st.spinner("Generating summary..."):
         try:
-            summary_result = summarizer(
-                processed_text,
-                max_length=150,
-                min_length=30,
-                do_sample=False
-            )
-            summary = summary_result[0]['summary_text']
-            return subject, summary, True
+            while not future.done() or not pieces.empty():
+                try:
+                    partial_summary += pieces.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                placeholder.markdown(partial_summary)
+            summary = future.result()
+        except BrokenProcessPool:
+            # The worker process died (e.g. out of memory); restart it on the next run
+            reset_model_worker(worker)
+            return subject, "The AI model stopped unexpectedly and will be restarted. Please try again.", False
         except Exception as e:
             return subject, f"Error generating summary: {str(e)}", False
-
-def load_sample_email():
-    """Return a sample email for demonstration"""
-    return """Subject: Project Update - Q4 Deliverables
-
-Hi Team,
-
-I wanted to provide a quick update on our Q4 project deliverables and timeline adjustments.
-
-First, I'm pleased to report that the alpha version of our new customer portal has been successfully deployed to the staging environment. The development team has done an excellent job implementing the core features, including user authentication, dashboard analytics, and the reporting module. Initial testing shows that page load times have improved by 40% compared to our current system.
-
-However, we've encountered some challenges with the payment integration module. The third-party API we're using has deprecated several endpoints, which means we need to refactor approximately 30% of our payment processing code. This will likely push our beta release back by two weeks.
-
-On a positive note, the mobile app development is ahead of schedule. Both iOS and Android versions are now feature-complete, and we're currently in the QA phase. User acceptance testing will begin next Monday with a group of 50 beta testers from our customer advisory board.
-
-Regarding budget, we're currently tracking at 92% of allocated resources. The additional two weeks for payment integration refactoring will require an additional $15,000 in development costs, which I've already discussed with finance.
-
-Action items for next week:
-- Complete payment API refactoring
-- Begin mobile app UAT
-- Finalize documentation for customer portal
-- Schedule stakeholder demo for November 15th
-
-Please let me know if you have any questions or concerns about these updates.
-
-Best regards,
-Sarah Johnson
-Project Manager"""
+        finally:
+            placeholder.empty()
+    
+    summary_cache.put(key, summary)
+    return subject, summary, True
 
 def main():
     # Header
@@ -175,14 +178,15 @@ def main():
                 unsafe_allow_html=True)
     
     # Load model
-    summarizer, model_loaded = load_summarization_model()
-    
-    if model_loaded:
-        st.success("✅ AI Model loaded successfully!")
-    else:
+    try:
+        worker = load_summarization_model()
+    except Exception as e:
+        st.error(f"Failed to load model: {str(e)}")
         st.error("❌ Failed to load AI model. Please refresh the page to try again.")
         return
     
+    st.success(f"✅ AI Model loaded successfully! Running on {worker.device}")
+    
     # Create two columns for layout
     col1, col2 = st.columns([1, 1], gap="large")
     
@@ -202,6 +206,13 @@ def main():
             help="You can paste complete email threads, forwarded messages, or any email content"
         )
         
+        # Summary length
+        summary_length = st.select_slider(
+            "Summary length:",
+            options=list(SUMMARY_LENGTHS),
+            value=DEFAULT_SUMMARY_LENGTH
+        )
+        
         # Buttons
         col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 2])
         with col_btn1:
@@ -216,7 +227,9 @@ def main():
         st.markdown("### 📊 Summary Results")
         
         if summarize_clicked and email_text:
-            subject, summary, success = summarize_email(email_text, summarizer)
+            subject, summary, success = summarize_email(email_text, worker,
+                                                        load_summary_cache(), st.empty(),
+                                                        summary_length)
             
             if success:
                 # Display results in styled containers
@@ -231,9 +244,9 @@ def main():
                 st.markdown('</div>', unsafe_allow_html=True)
                 
                 # Word count statistics
-                original_words = len(email_text.split())
-                summary_words = len(summary.split())
-                reduction = ((original_words - summary_words) / original_words) * 100
+                original_words, summary_words, reductions = summary_stats([email_text], [summary])
+                original_words, summary_words = int(original_words[0]), int(summary_words[0])
+                reduction = reductions[0]
                 
                 st.markdown("### 📈 Statistics")
                 col_stat1, col_stat2, col_stat3 = st.columns(3)
@@ -267,8 +280,8 @@ def main():
         - Shows reduction statistics
         
         **Tips:**
-        - Works best with emails between 100-1000 words
-        - The tool will automatically truncate very long emails
+        - Works best with emails between 100-750 words
+        - Emails longer than the model's 1024-token input limit are truncated automatically
         - Try the sample email to see how it works
         """)
     
@@ -276,8 +289,10 @@ def main():
     with st.sidebar:
         st.markdown("### 🤖 About the Model")
         st.info("""
-        This tool uses Facebook's BART model 
-        (bart-large-cnn) for text summarization.
+        This tool uses DistilBART 
+        (distilbart-cnn-12-6), a distilled 
+        version of Facebook's bart-large-cnn, 
+        for text summarization.
         
         BART is specifically fine-tuned on 
         news articles and performs well on 
@@ -297,8 +312,8 @@ def main():
         st.markdown("### ⚡ Performance")
         st.markdown("""
         - Processing time: 2-5 seconds
-        - Max input: ~1000 words
-        - Summary length: 30-150 words
+        - Max input: 1024 tokens (~750 words)
+        - Summary length: short, medium or long
         """)
 
 if __name__ == "__main__":
@@ -5,10 +5,12 @@ This application takes email messages as input and provides concise summaries.
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
-from transformers import pipeline
+import multiprocessing
+import queue
 import textwrap
-import re
+
+from email_core import (DEFAULT_SUMMARY_LENGTH, SAMPLE_EMAIL, SUMMARY_LENGTHS, SummaryCache,
+                        content_key, extract_subject, preprocess_email, serve_requests)
 
 class EmailSummarizer:
     def __init__(self):
@@ -20,15 +22,22 @@ class EmailSummarizer:
         self.style = ttk.Style()
         self.style.theme_use('clam')
         
-        # Model variable
-        self.summarizer = None
+        # Model worker state
+        self.worker = None
+        self.requests = None
+        self.responses = None
         self.model_loaded = False
+        self.summary_cache = SummaryCache()
+        
+        # Requests sent to the worker, by id: (subject, cache key)
+        self.pending = {}
+        self.next_request_id = 0
         
         # Setup UI
         self.setup_ui()
         
-        # Load model in background
-        self.load_model_thread()
+        # Load model in a worker process
+        self.start_model_worker()
         
     def setup_ui(self):
         """Create the user interface"""
@@ -62,6 +71,12 @@ class EmailSummarizer:
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, pady=10)
         
+        # Summary length selector
+        self.length_var = tk.StringVar(value=DEFAULT_SUMMARY_LENGTH)
+        length_box = ttk.Combobox(button_frame, textvariable=self.length_var, width=8,
+                                  values=list(SUMMARY_LENGTHS), state='readonly')
+        length_box.pack(side=tk.LEFT, padx=5)
+        
         # Summarize button
         self.summarize_btn = ttk.Button(button_frame, text="Summarize Email", 
                                         command=self.summarize_email, state='disabled')
@@ -109,26 +124,50 @@ class EmailSummarizer:
                                 command=self.load_sample_email)
         sample_btn.pack(side=tk.LEFT, padx=5)
         
-    def load_model_thread(self):
-        """Load the summarization model in a separate thread"""
-        thread = threading.Thread(target=self.load_model, daemon=True)
-        thread.start()
-        
-    def load_model(self):
-        """Load the summarization model"""
-        try:
-            # Use a smaller model for faster loading
-            self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-            self.model_loaded = True
+    def start_model_worker(self):
+        """Load the summarization model in a separate worker process"""
+        # Weight loading and inference run in another OS process so they never
+        # stall the Tk event loop, and a crashed worker doesn't close the app
+        context = multiprocessing.get_context("spawn")
+        self.requests = context.Queue()
+        self.responses = context.Queue()
+        self.worker = context.Process(target=serve_requests, 
+                                      args=(self.requests, self.responses),
+                                      daemon=True)
+        self.worker.start()
+        self.root.after(50, self.poll_worker)
+        
+    def poll_worker(self):
+        """Handle messages from the model worker (runs on the Tk event loop)"""
+        while True:
+            try:
+                kind, request_id, payload = self.responses.get_nowait()
+            except queue.Empty:
+                break
             
-            # Update UI in main thread
-            self.root.after(0, self.model_loaded_callback)
-        except Exception as e:
-            self.root.after(0, lambda: self.model_error_callback(str(e)))
+            if kind == "loaded":
+                self.model_loaded_callback(payload)
+            elif kind == "load_error":
+                self.model_error_callback(payload)
+            elif kind == "partial":
+                self.append_summary(payload)
+            elif kind == "summary":
+                subject, key = self.pending.pop(request_id)
+                self.summary_cache.put(key, payload)
+                self.display_results(subject, payload)
+            else:
+                self.pending.pop(request_id, None)
+                self.summarization_error(payload)
+        
+        if self.worker.is_alive():
+            self.root.after(50, self.poll_worker)
+        elif self.worker.exitcode != 0:
+            self.worker_crashed_callback()
             
-    def model_loaded_callback(self):
+    def model_loaded_callback(self, device):
         """Called when model is successfully loaded"""
-        self.status_label.config(text="Model loaded ✓", foreground='green')
+        self.model_loaded = True
+        self.status_label.config(text=f"Model loaded ✓ {device}", foreground='green')
         self.summarize_btn.config(state='normal')
         
     def model_error_callback(self, error_msg):
@@ -138,35 +177,17 @@ class EmailSummarizer:
                            f"Failed to load the summarization model:\n{error_msg}\n\n"
                            "Please check your internet connection and try again.")
         
-    def extract_subject(self, email_text):
-        """Extract subject from email (first line or first 60 chars)"""
-        lines = email_text.strip().split('\n')
-        first_line = lines[0] if lines else email_text[:60]
-        
-        # Clean up the subject
-        subject = first_line.strip()
-        if len(subject) > 60:
-            subject = subject[:57] + "..."
-            
-        return subject
-    
-    def preprocess_email(self, email_text):
-        """Preprocess email text for better summarization"""
-        # Remove excessive whitespace
-        text = re.sub(r'\n\s*\n', '\n\n', email_text)
-        
-        # Remove email headers if present
-        text = re.sub(r'^(From|To|Date|Subject|Cc|Bcc):.*$', '', text, flags=re.MULTILINE)
-        
-        # Remove quoted text (lines starting with >)
-        text = re.sub(r'^>.*$', '', text, flags=re.MULTILINE)
-        
-        # Remove email signatures (common patterns)
-        text = re.sub(r'(Best regards|Sincerely|Thanks|Regards|Best),?\s*\n.*', '', text, 
-                     flags=re.IGNORECASE | re.DOTALL)
+    def worker_crashed_callback(self):
+        """Called when the model worker process exits unexpectedly"""
+        self.model_loaded = False
+        self.pending.clear()
+        self.progress.stop()
+        self.summarize_btn.config(state='disabled')
+        self.status_label.config(text="Model worker stopped", foreground='red')
+        messagebox.showerror("Model Error", 
+                           "The summarization model stopped unexpectedly.\n\n"
+                           "Please restart the application.")
         
-        return text.strip()
-    
     def summarize_email(self):
         """Summarize the email content"""
         email_text = self.email_input.get("1.0", tk.END).strip()
@@ -179,42 +200,32 @@ class EmailSummarizer:
             messagebox.showwarning("Model Loading", "Please wait for the model to load.")
             return
             
+        subject = extract_subject(email_text)
+        processed_text = preprocess_email(email_text)
+        
+        # Reuse the summary if this text was summarized before
+        length = self.length_var.get()
+        key = (content_key(processed_text), length)
+        summary = self.summary_cache.get(key)
+        if summary is not None:
+            self.display_results(subject, summary)
+            return
+            
         # Start progress bar
         self.progress.start(10)
         self.summarize_btn.config(state='disabled')
         
-        # Run summarization in separate thread
-        thread = threading.Thread(target=self.perform_summarization, 
-                                 args=(email_text,), daemon=True)
-        thread.start()
+        # Clear previous results, the summary is streamed in as it's generated
+        self.subject_text.config(text=subject)
+        self.summary_output.config(state='normal')
+        self.summary_output.delete("1.0", tk.END)
+        self.summary_output.config(state='disabled')
+        
+        # Hand the email to the model worker, poll_worker displays the result
+        self.next_request_id += 1
+        self.pending[self.next_request_id] = (subject, key)
+        self.requests.put((self.next_request_id, processed_text, *SUMMARY_LENGTHS[length]))
         
-    def perform_summarization(self, email_text):
-        """Perform the actual summarization (runs in separate thread)"""
-        try:
-            # Extract subject
-            subject = self.extract_subject(email_text)
-            
-            # Preprocess email
-            processed_text = self.preprocess_email(email_text)
-            
-            # Truncate if too long (BART has max input length)
-            max_length = 1024
-            if len(processed_text) > max_length:
-                processed_text = processed_text[:max_length]
-            
-            # Generate summary
-            summary_result = self.summarizer(processed_text, 
-                                            max_length=150, 
-                                            min_length=30, 
-                                            do_sample=False)
-            summary = summary_result[0]['summary_text']
-            
-            # Update UI in main thread
-            self.root.after(0, lambda: self.display_results(subject, summary))
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.summarization_error(str(e)))
-            
     def display_results(self, subject, summary):
         """Display the summarization results"""
         self.progress.stop()
@@ -229,6 +240,13 @@ class EmailSummarizer:
         self.summary_output.insert("1.0", summary)
         self.summary_output.config(state='disabled')
         
+    def append_summary(self, text):
+        """Append a newly generated piece of the summary"""
+        self.summary_output.config(state='normal')
+        self.summary_output.insert(tk.END, text)
+        self.summary_output.see(tk.END)
+        self.summary_output.config(state='disabled')
+        
     def summarization_error(self, error_msg):
         """Handle summarization errors"""
         self.progress.stop()
@@ -246,44 +264,8 @@ class EmailSummarizer:
         
     def load_sample_email(self):
         """Load a sample email for testing"""
-        sample_email = """Subject: Project Update - Q4 Deliverables
-
-Hi Team,
-
-I wanted to provide a quick update on our Q4 project deliverables and timeline adjustments.
-
-First, I'm pleased to report that the alpha version of our new customer portal has been 
-successfully deployed to the staging environment. The development team has done an excellent 
-job implementing the core features, including user authentication, dashboard analytics, and 
-the reporting module. Initial testing shows that page load times have improved by 40% compared 
-to our current system.
-
-However, we've encountered some challenges with the payment integration module. The third-party 
-API we're using has deprecated several endpoints, which means we need to refactor approximately 
-30% of our payment processing code. This will likely push our beta release back by two weeks.
-
-On a positive note, the mobile app development is ahead of schedule. Both iOS and Android versions 
-are now feature-complete, and we're currently in the QA phase. User acceptance testing will begin 
-next Monday with a group of 50 beta testers from our customer advisory board.
-
-Regarding budget, we're currently tracking at 92% of allocated resources. The additional two weeks 
-for payment integration refactoring will require an additional $15,000 in development costs, which 
-I've already discussed with finance.
-
-Action items for next week:
-- Complete payment API refactoring
-- Begin mobile app UAT
-- Finalize documentation for customer portal
-- Schedule stakeholder demo for November 15th
-
-Please let me know if you have any questions or concerns about these updates.
-
-Best regards,
-Sarah Johnson
-Project Manager"""
-        
         self.email_input.delete("1.0", tk.END)
-        self.email_input.insert("1.0", sample_email)
+        self.email_input.insert("1.0", SAMPLE_EMAIL)
         
     def run(self):
         """Start the application"""